@@ -0,0 +1,152 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class AuthStore:
+    """
+    In-memory view of the auth config file, shared by every client using the same path.
+
+    Reads are served from memory and only go back to disk when the file's mtime/size/inode
+    changes (checked at most once every check_interval seconds).
+    Writes are serialized across processes with a lock file and replace the config
+    atomically (write to a temp file + rename), so readers never see a half-written file.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.check_interval = check_interval
+        self.version = 0
+        self._data: Dict[str, Any] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._last_check: Optional[float] = None
+        self._mutex = threading.RLock()
+
+    def read(self, force: bool = False) -> Tuple[int, Dict[str, Any]]:
+        """
+        Returns (version, config). The version is bumped every time the cached config changes,
+        so callers can cheaply tell whether they need to re-apply it.
+        The returned dict is shared and must not be modified.
+        """
+        with self._mutex:
+            now = time.monotonic()
+            if not force and self._last_check is not None and now - self._last_check < self.check_interval:
+                return self.version, self._data
+
+            self._last_check = now
+            signature = self._stat_signature()
+            if signature != self._signature:
+                self._reload(signature)
+            return self.version, self._data
+
+    def update(self, mutator: Callable[[Dict[str, Any]], None]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Applies mutator to the latest config on disk and writes the result back atomically.
+        The whole read-modify-write runs under an exclusive file lock, so concurrent
+        processes cannot overwrite each other's changes.
+        """
+        with self._mutex, self._file_lock():
+            current_config = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    try:
+                        current_config = json.load(f)
+                    except json.JSONDecodeError:
+                        pass
+
+            mutator(current_config)
+            self._write(current_config)
+
+            self._data = current_config
+            self._signature = self._stat_signature()
+            self._last_check = time.monotonic()
+            self.version += 1
+            return self.version, self._data
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _reload(self, signature: Optional[Tuple[int, int, int]]):
+        if signature is None:
+            data = {}
+        else:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                # Keep the last good copy; the signature is left stale so we retry on the next check
+                print(f"Warning: Failed to load auth from {self.path}: {e}")
+                return
+
+        self._data = data
+        self._signature = signature
+        self.version += 1
+
+    def _write(self, config: Dict[str, Any]):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _file_lock(self):
+        # A separate lock file is needed: the config itself is replaced on every write
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                # LK_LOCK gives up after ~10 seconds; keep waiting like flock does
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+_stores: Dict[str, AuthStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_auth_store(path: str) -> AuthStore:
+    """Returns the process-wide AuthStore for the given config path."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = AuthStore(key)
+        return store
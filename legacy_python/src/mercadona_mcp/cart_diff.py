@@ -0,0 +1,53 @@
+from typing import Any, Dict, Iterable, List
+
+# A cart reduced to what the API cares about: product_id -> quantity
+CartLines = Dict[str, float]
+
+
+def lines_from_cart(cart: Dict[str, Any]) -> CartLines:
+    """Extracts product quantities from a cart as returned by the API."""
+    return {line["product"]["id"]: line["quantity"] for line in cart.get("lines", [])}
+
+
+def merge_items(current: CartLines, items: Iterable[Dict[str, Any]]) -> CartLines:
+    """
+    Returns a new set of lines with the given items added on top of the current ones.
+    items format: [{"product_id": "123", "quantity": 2}, ...]
+    Items without a product_id are ignored; quantities default to 1.
+    """
+    merged = dict(current)
+    for item in items:
+        product_id = item.get("product_id")
+        if not product_id:
+            continue
+        merged[product_id] = merged.get(product_id, 0) + item.get("quantity", 1)
+
+    # Lines that dropped to zero (or below) are not valid cart lines
+    return {pid: qty for pid, qty in merged.items() if qty > 0}
+
+
+def diff_lines(current: CartLines, target: CartLines) -> Dict[str, Any]:
+    """
+    Computes the change set needed to go from the current lines to the target lines.
+    Returns {"added": {pid: qty}, "updated": {pid: qty}, "removed": [pid, ...]}.
+    """
+    added = {}
+    updated = {}
+    for pid, qty in target.items():
+        if pid not in current:
+            added[pid] = qty
+        elif current[pid] != qty:
+            updated[pid] = qty
+
+    removed = [pid for pid in current if pid not in target]
+    return {"added": added, "updated": updated, "removed": removed}
+
+
+def is_empty_diff(diff: Dict[str, Any]) -> bool:
+    """True when a change set produced by diff_lines would not modify the cart."""
+    return not (diff["added"] or diff["updated"] or diff["removed"])
+
+
+def to_cart_items(lines: CartLines) -> List[Dict[str, Any]]:
+    """Converts lines back into the payload format expected by update_cart_items."""
+    return [{"product_id": pid, "quantity": qty} for pid, qty in lines.items()]
@@ -2,6 +2,8 @@ import json
 import requests
 import os
 from typing import Optional, Dict, List, Any
+from .auth_store import get_auth_store
+from .cart_diff import CartLines, diff_lines, is_empty_diff, lines_from_cart, merge_items, to_cart_items
 
 class MercadonaClient:
     ALGOLIA_APP_ID = "7UZJKL1DJ0"
@@ -14,6 +16,8 @@ class MercadonaClient:
         self.uuid = None
         self.warehouse_id = "4115" # Default to Valencia
         self.postal_code = None
+        self._store = get_auth_store(self.auth_file)
+        self._auth_version = None
         self.load_auth()
 
     @property
@@ -30,60 +34,63 @@ class MercadonaClient:
             print(f"Auth file {self.auth_file} not found. Using defaults.")
             return
         
+        self._auth_version, auth_config = self._store.read(force=True)
+        self._apply_auth_config(auth_config)
+
+    def _sync_auth(self):
+        """
+        Re-applies the auth config if the shared store has picked up a newer version.
+        Called before building any request so the URL (uuid, warehouse) and headers (token) agree.
+        """
+        version, auth_config = self._store.read()
+        if version != self._auth_version:
+            self._auth_version = version
+            self._apply_auth_config(auth_config)
+
+    def _apply_auth_config(self, auth_config: Dict[str, Any]):
+        """Sets token, UUID, and location from a parsed auth config."""
         try:
-            with open(self.auth_file, "r") as f:
-                auth_config = json.load(f)
-                
-                # Load MO-user (Token & UUID)
-                if "local_storage" in auth_config and "MO-user" in auth_config["local_storage"]:
-                    mo_user_str = auth_config["local_storage"]["MO-user"]
-                    # It might be a stringified JSON or just a dict depending on how it was saved
-                    if isinstance(mo_user_str, str):
-                        try:
-                            mo_user = json.loads(mo_user_str)
-                        except json.JSONDecodeError:
-                            print("Error decoding MO-user string")
-                            mo_user = {}
-                    else:
-                        mo_user = mo_user_str
-                    
-                    self.token = mo_user.get("token")
-                    self.uuid = mo_user.get("uuid")
-
-                # Load Location (Warehouse & Postal Code)
-                # We look in a custom "location" key or infer from cookies if previously saved there
-                if "location" in auth_config:
-                    self.postal_code = auth_config["location"].get("postal_code")
-                    self.warehouse_id = auth_config["location"].get("warehouse_id", "4115")
-                
-                # Check cookies for __mo_da if location is missing
-                elif "cookies" in auth_config and "__mo_da" in auth_config["cookies"]:
+            # Load MO-user (Token & UUID)
+            if "local_storage" in auth_config and "MO-user" in auth_config["local_storage"]:
+                mo_user_str = auth_config["local_storage"]["MO-user"]
+                # It might be a stringified JSON or just a dict depending on how it was saved
+                if isinstance(mo_user_str, str):
                     try:
-                        mo_da_val = auth_config["cookies"]["__mo_da"]
-                        # It might be URL encoded or just raw JSON string
-                        # Simple retrieval if it looks like JSON
-                        if "{" in mo_da_val:
-                            mo_da = json.loads(mo_da_val)
-                            self.warehouse_id = mo_da.get("warehouse", self.warehouse_id)
-                            self.postal_code = mo_da.get("postalCode", self.postal_code)
-                    except Exception as e:
-                       print(f"Failed to parse __mo_da cookie: {e}")
-
-        except (FileNotFoundError, KeyError, json.JSONDecodeError) as e:
+                        mo_user = json.loads(mo_user_str)
+                    except json.JSONDecodeError:
+                        print("Error decoding MO-user string")
+                        mo_user = {}
+                else:
+                    mo_user = mo_user_str
+                
+                self.token = mo_user.get("token")
+                self.uuid = mo_user.get("uuid")
+
+            # Load Location (Warehouse & Postal Code)
+            # We look in a custom "location" key or infer from cookies if previously saved there
+            if "location" in auth_config:
+                self.postal_code = auth_config["location"].get("postal_code")
+                self.warehouse_id = auth_config["location"].get("warehouse_id") or "4115"
+            
+            # Check cookies for __mo_da if location is missing
+            elif "cookies" in auth_config and "__mo_da" in auth_config["cookies"]:
+                try:
+                    mo_da_val = auth_config["cookies"]["__mo_da"]
+                    # It might be URL encoded or just raw JSON string
+                    # Simple retrieval if it looks like JSON
+                    if "{" in mo_da_val:
+                        mo_da = json.loads(mo_da_val)
+                        self.warehouse_id = mo_da.get("warehouse", self.warehouse_id)
+                        self.postal_code = mo_da.get("postalCode", self.postal_code)
+                except Exception as e:
+                   print(f"Failed to parse __mo_da cookie: {e}")
+
+        except (KeyError, AttributeError) as e:
             print(f"Warning: Failed to load auth from {self.auth_file}: {e}")
 
     def save_auth(self, mo_user_data: Dict[str, Any] = None, location_data: Dict[str, str] = None) -> bool:
         """Saves auth and/or location data to the config file."""
-        try:
-            # Load existing first to preserve other keys
-            current_config = {}
-            if os.path.exists(self.auth_file):
-                with open(self.auth_file, "r") as f:
-                    try:
-                        current_config = json.load(f)
-                    except json.JSONDecodeError:
-                        pass
-            
+        def apply(current_config: Dict[str, Any]):
             # Update MO-user if provided
             if mo_user_data:
                 if "local_storage" not in current_config:
@@ -91,10 +98,6 @@ class MercadonaClient:
                 # Ensure we store it as a string if that's the convention, or simple dict. 
                 # The previous code expected json.loads on read, so we stick to stringified JSON for MO-user to match browser localStorage format.
                 current_config["local_storage"]["MO-user"] = json.dumps(mo_user_data)
-                
-                # Update in-memory
-                self.token = mo_user_data.get("token")
-                self.uuid = mo_user_data.get("uuid")
 
             # Update Location if provided
             if location_data:
@@ -102,23 +105,22 @@ class MercadonaClient:
                     "postal_code": location_data.get("postal_code"),
                     "warehouse_id": location_data.get("warehouse_id")
                 }
-                # Update in-memory
-                self.postal_code = location_data.get("postal_code")
-                if location_data.get("warehouse_id"):
-                    self.warehouse_id = location_data.get("warehouse_id")
 
-            with open(self.auth_file, "w") as f:
-                json.dump(current_config, f, indent=2)
-            
-            return True
+        try:
+            # Read-modify-write happens under a file lock and lands atomically
+            self._auth_version, auth_config = self._store.update(apply)
         except Exception as e:
             print(f"Failed to save auth: {e}")
             return False
 
+        # Apply the merged config, which may include changes made by other processes
+        self._apply_auth_config(auth_config)
+        return True
+
     @property
     def headers(self) -> Dict[str, str]:
-        if not self.token:
-            self.load_auth()
+        # Served from the shared in-memory store; disk is only checked when the file changes
+        self._sync_auth()
         return {
             "Authorization": f"Bearer {self.token}",
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -127,6 +129,7 @@ class MercadonaClient:
 
     def search_products(self, query: str) -> List[Dict[str, Any]]:
         """Searches for products using Algolia."""
+        self._sync_auth()
         headers = {
             "x-algolia-application-id": self.ALGOLIA_APP_ID,
             "x-algolia-api-key": self.ALGOLIA_API_KEY,
@@ -154,6 +157,7 @@ class MercadonaClient:
 
     def get_product_details(self, product_id: str) -> Optional[Dict[str, Any]]:
         """Fetches detailed information for a specific product."""
+        self._sync_auth()
         url = f"{self.BASE_URL}/products/{product_id}/"
         try:
             resp = requests.get(url, headers=self.headers)
@@ -166,6 +170,7 @@ class MercadonaClient:
 
     def get_cart(self) -> Optional[Dict[str, Any]]:
         """Retrieves the current shopping cart."""
+        self._sync_auth()
         url = f"{self.BASE_URL}/customers/{self.uuid}/cart/{self.common_params}"
         try:
             resp = requests.get(url, headers=self.headers)
@@ -178,16 +183,19 @@ class MercadonaClient:
             print(f"Get cart exception: {e}")
             return None
 
-    def update_cart_items(self, items: List[Dict[str, Any]]) -> bool:
+    def update_cart_items(self, items: List[Dict[str, Any]], current_cart: Optional[Dict[str, Any]] = None) -> bool:
         """
         Updates the cart with the provided list of items (lines).
         Note: This replaces the entire cart content.
         items format: [{"product_id": "123", "quantity": 1}, ...]
+        If current_cart is given, its id/version are used instead of fetching the cart again.
         """
-        current_cart = self.get_cart()
+        if current_cart is None:
+            current_cart = self.get_cart()
         if not current_cart:
             return False
 
+        self._sync_auth()
         url = f"{self.BASE_URL}/customers/{self.uuid}/cart/{self.common_params}"
         payload = {
             "id": current_cart["id"],
@@ -206,30 +214,32 @@ class MercadonaClient:
             print(f"Update cart exception: {e}")
             return False
 
-    def add_to_cart(self, product_id: str, quantity: int = 1) -> bool:
-        """Adds an item to the existing cart (merges with existing)."""
-        current_cart = self.get_cart()
+    def apply_cart_lines(self, target: CartLines, current_cart: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Brings the cart to the target lines (product_id -> quantity).
+        Only writes when the target differs from the current cart.
+        Returns the applied change set (see cart_diff.diff_lines), or None on failure.
+        """
+        # The cart is deliberately fetched fresh rather than cached between calls: the PUT must
+        # carry the current version, and the cart can change outside this process (web, app).
+        # Diffing against a stale copy could wrongly skip a write. Callers pass the cart they
+        # already fetched, so each change costs one GET and at most one PUT.
+        if current_cart is None:
+            current_cart = self.get_cart()
         if not current_cart:
-            return False
+            return None
 
-        lines_map = {}
-        for line in current_cart.get("lines", []):
-            pid = line["product"]["id"]
-            lines_map[pid] = {
-                "product_id": pid,
-                "quantity": line["quantity"]
-            }
-        
-        # Add or update
-        if product_id in lines_map:
-            lines_map[product_id]["quantity"] += quantity
-        else:
-            lines_map[product_id] = {
-                "product_id": product_id,
-                "quantity": quantity
-            }
-            
-        return self.update_cart_items(list(lines_map.values()))
+        diff = diff_lines(lines_from_cart(current_cart), target)
+        if is_empty_diff(diff):
+            return diff
+
+        if not self.update_cart_items(to_cart_items(target), current_cart):
+            return None
+        return diff
+
+    def add_to_cart(self, product_id: str, quantity: int = 1) -> bool:
+        """Adds an item to the existing cart (merges with existing)."""
+        return self.add_to_cart_bulk([{"product_id": product_id, "quantity": quantity}])
 
     def add_to_cart_bulk(self, items: List[Dict[str, Any]]) -> bool:
         """
@@ -240,32 +250,8 @@ class MercadonaClient:
         if not current_cart:
             return False
 
-        lines_map = {}
-        for line in current_cart.get("lines", []):
-            pid = line["product"]["id"]
-            lines_map[pid] = {
-                "product_id": pid,
-                "quantity": line["quantity"]
-            }
-        
-        # Add or update with new items
-        for item in items:
-            product_id = item.get("product_id")
-            quantity = item.get("quantity", 1)
-            
-            if not product_id:
-                continue
-                
-            if product_id in lines_map:
-                lines_map[product_id]["quantity"] += quantity
-            else:
-                lines_map[product_id] = {
-                    "product_id": product_id,
-                    "quantity": quantity
-                }
-            
-        return self.update_cart_items(list(lines_map.values()))
-
+        target = merge_items(lines_from_cart(current_cart), items)
+        return self.apply_cart_lines(target, current_cart) is not None
 
     def remove_from_cart(self, product_id: str) -> bool:
         """Removes an item from the cart."""
@@ -273,23 +259,17 @@ class MercadonaClient:
         if not current_cart:
             return False
 
-        lines = []
-        for line in current_cart.get("lines", []):
-            pid = line["product"]["id"]
-            if pid != product_id:
-                lines.append({
-                    "product_id": pid,
-                    "quantity": line["quantity"]
-                })
-        
-        return self.update_cart_items(lines)
+        target = lines_from_cart(current_cart)
+        target.pop(product_id, None)
+        return self.apply_cart_lines(target, current_cart) is not None
 
     def clear_cart(self) -> bool:
         """Clears all items from the shopping cart."""
-        return self.update_cart_items([])
+        return self.apply_cart_lines({}) is not None
 
     def list_orders(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Lists recent orders."""
+        self._sync_auth()
         url = f"{self.BASE_URL}/customers/{self.uuid}/orders/"
         orders = []
         try:
@@ -305,6 +285,7 @@ class MercadonaClient:
     def get_order_details(self, order_id: str) -> Optional[Dict[str, Any]]:
         """Gets details (lines) of a specific past order."""
         # Note: 'prepared' lines are for delivered orders.
+        self._sync_auth()
         url = f"{self.BASE_URL}/customers/{self.uuid}/orders/{order_id}/lines/prepared/"
         try:
             resp = requests.get(url, headers=self.headers)
@@ -313,3 +294,25 @@ class MercadonaClient:
             return None
         except Exception:
             return None
+
+    def reorder_from_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Adds the prepared lines of a past order to the current cart in a single write.
+        Returns the applied change set, or None if the order or cart could not be fetched.
+        """
+        order_lines = self.get_order_details(order_id)
+        if order_lines is None:
+            return None
+
+        items = [
+            {"product_id": line["product_id"], "quantity": line["ordered_quantity"]}
+            for line in order_lines
+            if line.get("product_id") and (line.get("ordered_quantity") or 0) > 0
+        ]
+
+        current_cart = self.get_cart()
+        if not current_cart:
+            return None
+
+        target = merge_items(lines_from_cart(current_cart), items)
+        return self.apply_cart_lines(target, current_cart)
@@ -1,5 +1,6 @@
 from mcp.server.fastmcp import FastMCP
 from .mercadona_client import MercadonaClient
+from .cart_diff import is_empty_diff
 import sys
 import json
 import os
@@ -226,6 +227,30 @@ def list_recent_orders(limit: int = 100):
     check_client()
     return client.list_orders(limit)
 
+@mcp.tool()
+def reorder_from_order(order_id: str):
+    """
+    Add all products from a past order to the current cart in a single update.
+    Quantities are merged with items already in the cart.
+    Args:
+        order_id: The ID of the past order to re-order.
+                  Can be obtained from list_recent_orders results.
+    """
+    check_client()
+    diff = client.reorder_from_order(order_id)
+    if diff is None:
+        return f"Failed to re-order order {order_id}."
+
+    # Merging only ever adds quantity, so an empty diff means the order had no valid lines
+    if is_empty_diff(diff):
+        return f"Order {order_id} had no products to re-order. The cart was not modified."
+
+    return (
+        f"Re-ordered order {order_id}: {len(diff['added'])} new product(s) added, "
+        f"{len(diff['updated'])} product(s) with updated quantity.\n\n"
+        "INSTRUCTION TO ORCHESTRATOR: Please invite the user to check their cart at https://tienda.mercadona.es/"
+    )
+
 @mcp.tool()
 def calculate_smart_cart():
     """
@@ -0,0 +1,166 @@
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from mercadona_mcp import auth_store, mercadona_client
+from mercadona_mcp.auth_store import get_auth_store
+from mercadona_mcp.mercadona_client import MercadonaClient
+
+WRITERS = 4
+READERS = 4
+WRITES_PER_PROCESS = 100
+READS_PER_PROCESS = 500
+
+
+def increment(config):
+    config["counter"] = config.get("counter", 0) + 1
+
+
+def write_auth(args):
+    auth_file, writer = args
+    client = MercadonaClient(auth_file=auth_file)
+    store = get_auth_store(auth_file)
+    for i in range(WRITES_PER_PROCESS):
+        # A counted read-modify-write: any lost update shows up in the final total
+        store.update(increment)
+        # One key per writer and iteration, written through the client
+        ok = client.save_auth(location_data={"postal_code": f"{writer}-{i}", "warehouse_id": str(writer)})
+        store.update(lambda config: config.setdefault("writes", {}).__setitem__(f"{writer}-{i}", True))
+        if not ok:
+            return False
+    return True
+
+
+def read_auth(auth_file):
+    client = MercadonaClient(auth_file=auth_file)
+    store = get_auth_store(auth_file)
+    store.check_interval = 0
+    failures = 0
+    last_counter = 0
+    for _ in range(READS_PER_PROCESS):
+        if client.headers["Authorization"] != "Bearer token-0":
+            failures += 1
+        _, config = store.read()
+        counter = config.get("counter", 0)
+        # Committed writes are never rolled back
+        if counter < last_counter:
+            failures += 1
+        last_counter = counter
+    return failures
+
+
+@pytest.fixture
+def auth_file(tmp_path):
+    path = str(tmp_path / "auth.json")
+    MercadonaClient(auth_file=path).save_auth(
+        mo_user_data={"token": "token-0", "uuid": "uuid-1"},
+        location_data={"postal_code": "46001", "warehouse_id": "4115"},
+    )
+    return path
+
+
+def test_concurrent_processes_never_corrupt_auth_file(auth_file):
+    with multiprocessing.Pool(WRITERS + READERS) as pool:
+        writes = pool.map_async(write_auth, [(auth_file, w) for w in range(WRITERS)])
+        read_failures = pool.map(read_auth, [auth_file] * READERS)
+        assert all(writes.get())
+
+    assert sum(read_failures) == 0
+
+    # Every read-modify-write from every process survived
+    with open(auth_file, "r") as f:
+        config = json.load(f)
+    assert config["counter"] == WRITERS * WRITES_PER_PROCESS
+    assert set(config["writes"]) == {f"{w}-{i}" for w in range(WRITERS) for i in range(WRITES_PER_PROCESS)}
+    assert json.loads(config["local_storage"]["MO-user"])["token"] == "token-0"
+    assert config["location"]["warehouse_id"] in {str(w) for w in range(WRITERS)}
+
+    # No temp files are left behind
+    leftovers = [name for name in os.listdir(os.path.dirname(auth_file)) if name.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_save_auth_is_visible_to_other_clients(auth_file):
+    writer = MercadonaClient(auth_file=auth_file)
+    reader = MercadonaClient(auth_file=auth_file)
+
+    writer.save_auth(mo_user_data={"token": "fresh-token", "uuid": "uuid-2"})
+
+    assert reader.headers["Authorization"] == "Bearer fresh-token"
+    assert reader.uuid == "uuid-2"
+
+
+def test_external_rewrite_is_picked_up_after_check_interval(auth_file):
+    store = get_auth_store(auth_file)
+    store.check_interval = 0.05
+    client = MercadonaClient(auth_file=auth_file)
+    assert client.headers["Authorization"] == "Bearer token-0"
+
+    # Rewrite in place, as the login flow does
+    with open(auth_file, "w") as f:
+        json.dump({"local_storage": {"MO-user": json.dumps({"token": "external-token", "uuid": "uuid-3"})}}, f)
+
+    time.sleep(store.check_interval * 2)
+    assert client.headers["Authorization"] == "Bearer external-token"
+
+
+def test_headers_do_not_touch_disk_within_check_interval(auth_file, monkeypatch):
+    client = MercadonaClient(auth_file=auth_file)
+    get_auth_store(auth_file).check_interval = 60
+    client.headers
+
+    def fail(*args, **kwargs):
+        raise AssertionError("disk accessed")
+
+    monkeypatch.setattr(auth_store.os, "stat", fail)
+    assert client.headers["Authorization"] == "Bearer token-0"
+
+
+def test_save_auth_applies_changes_made_by_other_processes(auth_file):
+    client = MercadonaClient(auth_file=auth_file)
+    get_auth_store(auth_file).check_interval = 60
+    assert client.headers["Authorization"] == "Bearer token-0"
+
+    # Another process logs in again; this process has not noticed yet
+    with open(auth_file, "r") as f:
+        config = json.load(f)
+    config["local_storage"]["MO-user"] = json.dumps({"token": "other-token", "uuid": "uuid-9"})
+    with open(auth_file, "w") as f:
+        json.dump(config, f)
+
+    assert client.save_auth(location_data={"postal_code": "28001", "warehouse_id": "1"})
+
+    assert client.headers["Authorization"] == "Bearer other-token"
+    assert client.uuid == "uuid-9"
+    assert client.warehouse_id == "1"
+
+
+def test_request_urls_use_synced_location(auth_file, monkeypatch):
+    urls = []
+
+    def fake_post(url, **kwargs):
+        urls.append(url)
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(mercadona_client.requests, "post", fake_post)
+    client = MercadonaClient(auth_file=auth_file)
+    MercadonaClient(auth_file=auth_file).save_auth(location_data={"postal_code": "28001", "warehouse_id": "9999"})
+
+    client.search_products("leche")
+
+    assert "products_prod_9999_es" in urls[0]
+
+
+def test_failed_write_leaves_no_temp_files_and_keeps_config(auth_file):
+    store = get_auth_store(auth_file)
+
+    with pytest.raises(TypeError):
+        store.update(lambda config: config.__setitem__("broken", object()))
+
+    assert [name for name in os.listdir(os.path.dirname(auth_file)) if name.endswith(".tmp")] == []
+    with open(auth_file, "r") as f:
+        assert "broken" not in json.load(f)
+    assert MercadonaClient(auth_file=auth_file).headers["Authorization"] == "Bearer token-0"
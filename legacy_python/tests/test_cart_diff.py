@@ -0,0 +1,181 @@
+import os
+import time
+
+import pytest
+
+from mercadona_mcp import mercadona_client
+from mercadona_mcp.cart_diff import diff_lines, is_empty_diff, lines_from_cart, merge_items, to_cart_items
+from mercadona_mcp.mercadona_client import MercadonaClient
+
+CART_SIZE = 200
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+
+def make_cart(size=CART_SIZE):
+    return {
+        "id": "cart-1",
+        "version": 7,
+        "lines": [{"product": {"id": str(i)}, "quantity": 1} for i in range(size)],
+    }
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Stubs the Mercadona API with a 200-line cart and records every call."""
+    calls = []
+    state = {
+        "cart": make_cart(),
+        "order_lines": [{"product_id": str(i), "ordered_quantity": 2} for i in range(150, 250)],
+    }
+
+    def fake_get(url, **kwargs):
+        if "/orders/" in url:
+            calls.append(("GET", "order"))
+            return FakeResponse(200, {"results": state["order_lines"]})
+        calls.append(("GET", "cart"))
+        return FakeResponse(200, state["cart"])
+
+    def fake_put(url, json=None, **kwargs):
+        calls.append(("PUT", json))
+        return FakeResponse(200, {})
+
+    monkeypatch.setattr(mercadona_client.requests, "get", fake_get)
+    monkeypatch.setattr(mercadona_client.requests, "put", fake_put)
+
+    client = MercadonaClient(auth_file=str(tmp_path / "auth.json"))
+    return client, calls, state
+
+
+# cart_diff
+
+def test_merge_adds_to_existing_and_new_lines():
+    merged = merge_items({"1": 1}, [{"product_id": "1", "quantity": 2}, {"product_id": "2"}])
+    assert merged == {"1": 3, "2": 1}
+
+
+def test_merge_drops_lines_at_or_below_zero():
+    merged = merge_items({"1": 2, "2": 1}, [{"product_id": "1", "quantity": -2}, {"product_id": "2", "quantity": -5}])
+    assert merged == {}
+
+
+def test_merge_ignores_items_without_product_id():
+    merged = merge_items({"1": 1}, [{"quantity": 3}, {"product_id": "", "quantity": 1}, {"product_id": None}])
+    assert merged == {"1": 1}
+
+
+def test_merge_and_diff_float_quantities():
+    current = {"fruit": 0.5}
+    merged = merge_items(current, [{"product_id": "fruit", "quantity": 0.25}])
+    assert merged == {"fruit": 0.75}
+    assert diff_lines(current, merged) == {"added": {}, "updated": {"fruit": 0.75}, "removed": []}
+
+
+def test_merge_does_not_mutate_current():
+    current = {"1": 1}
+    merge_items(current, [{"product_id": "1", "quantity": 1}])
+    assert current == {"1": 1}
+
+
+def test_diff_lines():
+    diff = diff_lines({"1": 1, "2": 2, "3": 3}, {"1": 1, "2": 5, "4": 1})
+    assert diff == {"added": {"4": 1}, "updated": {"2": 5}, "removed": ["3"]}
+    assert not is_empty_diff(diff)
+
+
+def test_diff_of_identical_lines_is_empty():
+    lines = lines_from_cart(make_cart())
+    assert is_empty_diff(diff_lines(lines, dict(lines)))
+
+
+def test_cart_round_trip():
+    lines = lines_from_cart(make_cart(3))
+    assert to_cart_items(lines) == [
+        {"product_id": "0", "quantity": 1},
+        {"product_id": "1", "quantity": 1},
+        {"product_id": "2", "quantity": 1},
+    ]
+
+
+def test_merge_and_diff_200_lines():
+    current = lines_from_cart(make_cart())
+    items = [{"product_id": str(i), "quantity": 1} for i in range(100, 100 + CART_SIZE)]
+
+    diff = diff_lines(current, merge_items(current, items))
+
+    assert len(diff["added"]) == 100
+    assert len(diff["updated"]) == 100
+    assert diff["removed"] == []
+
+
+@pytest.mark.skipif(not os.getenv("MERCADONA_BENCHMARK"), reason="set MERCADONA_BENCHMARK=1 to run benchmarks")
+def test_merge_and_diff_benchmark_200_lines():
+    current = lines_from_cart(make_cart())
+    items = [{"product_id": str(i), "quantity": 1} for i in range(100, 100 + CART_SIZE)]
+
+    runs = 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        diff_lines(current, merge_items(current, items))
+    per_run_ms = (time.perf_counter() - start) * 1000 / runs
+
+    assert per_run_ms < 50, f"merge + diff of {CART_SIZE} items took {per_run_ms:.3f} ms"
+
+
+# MercadonaClient cart writes
+
+def test_bulk_add_of_nothing_skips_put(api):
+    client, calls, _ = api
+    assert client.add_to_cart_bulk([])
+    assert calls == [("GET", "cart")]
+
+
+def test_removing_absent_product_skips_put(api):
+    client, calls, _ = api
+    assert client.remove_from_cart("not-in-cart")
+    assert calls == [("GET", "cart")]
+
+
+def test_bulk_add_is_one_get_and_one_put(api):
+    client, calls, _ = api
+    items = [{"product_id": str(i), "quantity": 1} for i in range(CART_SIZE, 2 * CART_SIZE)]
+    assert client.add_to_cart_bulk(items)
+
+    assert [c[0] for c in calls] == ["GET", "PUT"]
+    payload = calls[1][1]
+    assert payload["id"] == "cart-1"
+    assert payload["version"] == 7
+    assert len(payload["lines"]) == 2 * CART_SIZE
+
+
+def test_reorder_from_order_is_single_write(api):
+    client, calls, state = api
+    state["order_lines"].append({"product_id": "broken", "ordered_quantity": None})
+
+    diff = client.reorder_from_order("42")
+
+    assert [(c[0], c[1] if c[0] == "GET" else None) for c in calls] == [
+        ("GET", "order"),
+        ("GET", "cart"),
+        ("PUT", None),
+    ]
+    assert len(diff["added"]) == 50
+    assert len(diff["updated"]) == 50
+    assert diff["removed"] == []
+    assert "broken" not in {line["product_id"] for line in calls[2][1]["lines"]}
+
+
+def test_reorder_from_order_without_valid_lines_skips_put(api):
+    client, calls, state = api
+    state["order_lines"] = [{"product_id": "1", "ordered_quantity": 0}]
+
+    assert is_empty_diff(client.reorder_from_order("42"))
+    assert [c[0] for c in calls] == ["GET", "GET"]